@@ -0,0 +1,226 @@
+"""
+Camera Resolution / Quality Sweep
+Offline tool for choosing per-site camera defaults. Re-encodes sample frames at
+every FRAMESIZE_* resolution the firmware supports and a range of JPEG
+qualities, then estimates the cellular upload time of each result.
+- Encoded size is what capture_and_send_photo() would publish to simcam/<device>
+- Quality is PSNR of the encode, scaled back up, against the full-resolution sample
+- Upload time is estimated per SIM7600 bandwidth profile (configurable)
+
+Qualities use the libjpeg 1-95 scale (higher is better), not the 0-63 sensor
+scale of camera_config.jpeg_quality; use the size column to find the nearest
+sensor setting.
+
+Usage:
+    python camera_sweep.py frames/*.jpg
+    python camera_sweep.py frames/*.jpg --qualities 40,60,80 --profile rural=96:3 --csv sweep.csv
+    python camera_sweep.py frames/*.jpg --min-psnr 30
+
+Requires numpy and Pillow.
+"""
+
+import io
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Frame sizes selectable in main/Kconfig.projbuild (see FRAMESIZE_STRING in main.c)
+FRAMESIZES = {
+    "FRAMESIZE_240X240": (240, 240),
+    "FRAMESIZE_QVGA": (320, 240),
+    "FRAMESIZE_HVGA": (480, 320),
+    "FRAMESIZE_VGA": (640, 480),
+    "FRAMESIZE_SVGA": (800, 600),
+    "FRAMESIZE_XGA": (1024, 768),
+    "FRAMESIZE_HD": (1280, 720),
+    "FRAMESIZE_SXGA": (1280, 1024),
+    "FRAMESIZE_UXGA": (1600, 1200),
+    "FRAMESIZE_QXGA": (2048, 1536),
+    "FRAMESIZE_QSXGA": (2560, 1920),
+    "FRAMESIZE_5MP": (2592, 1944),
+}
+
+DEFAULT_QUALITIES = [30, 50, 70, 85, 95]
+
+# SIM7600 uplink profiles: name -> (effective uplink kbit/s, per-upload setup seconds)
+# Setup covers waking the modem, the MQTT publish handshake and QoS 1 ack.
+BANDWIDTH_PROFILES = {
+    "lte_good": (2000, 1.0),
+    "lte_weak": (400, 2.0),
+    "hspa": (250, 2.0),
+    "rural": (64, 3.0),
+}
+
+# MQTT fixed header, topic and packet id for one simcam publish, plus TLS record overhead
+PUBLISH_OVERHEAD_BYTES = 64
+TLS_OVERHEAD_RATIO = 0.02
+
+
+# =============================================================================
+# SWEEP
+# =============================================================================
+
+def upload_seconds(size_bytes, kbps, setup_seconds):
+    """Estimate the time to publish one frame over a link profile."""
+    wire_bytes = (size_bytes + PUBLISH_OVERHEAD_BYTES) * (1 + TLS_OVERHEAD_RATIO)
+    return setup_seconds + wire_bytes * 8 / (kbps * 1000)
+
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio in dB between two uint8 arrays of the same shape."""
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def sweep_frame_size(job):
+    """Encode one sample at one frame size for every quality; run in a worker process."""
+    path, framesize, qualities = job
+    width, height = FRAMESIZES[framesize]
+
+    with Image.open(path) as img:
+        source = img.convert("RGB")
+    reference = np.asarray(source)
+
+    # The sensor crops to the target aspect ratio before scaling
+    scale = min(source.width / width, source.height / height)
+    crop_w, crop_h = int(width * scale), int(height * scale)
+    left, top = (source.width - crop_w) // 2, (source.height - crop_h) // 2
+    box = (left, top, left + crop_w, top + crop_h)
+    reference = reference[top:top + crop_h, left:left + crop_w]
+    frame = source.resize((width, height), Image.LANCZOS, box=box)
+
+    rows = []
+    for quality in qualities:
+        start = time.perf_counter()
+        buf = io.BytesIO()
+        frame.save(buf, format="JPEG", quality=quality)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        buf.seek(0)
+        with Image.open(buf) as decoded:
+            restored = np.asarray(decoded.convert("RGB").resize((crop_w, crop_h), Image.BILINEAR))
+
+        rows.append({
+            "sample": path,
+            "framesize": framesize,
+            "resolution": f"{width}x{height}",
+            "quality": quality,
+            "bytes": buf.getbuffer().nbytes,
+            "psnr_db": round(psnr(reference, restored), 2),
+            "encode_ms": round(encode_ms, 1),
+        })
+    return rows
+
+
+def run_sweep(samples, framesizes, qualities, profiles, workers=None):
+    """Sweep every sample, frame size and quality in parallel; return result rows."""
+    jobs = [(path, fs, qualities) for path in samples for fs in framesizes]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = [row for batch in pool.map(sweep_frame_size, jobs) for row in batch]
+
+    for row in rows:
+        for name, (kbps, setup) in profiles.items():
+            row[f"upload_s_{name}"] = round(upload_seconds(row["bytes"], kbps, setup), 1)
+    return rows
+
+
+def summarize(rows, profiles):
+    """Average each (frame size, quality) over all samples."""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["framesize"], row["quality"]), []).append(row)
+
+    summary = []
+    for (framesize, quality), group in groups.items():
+        entry = {
+            "framesize": framesize,
+            "resolution": group[0]["resolution"],
+            "quality": quality,
+            "bytes": int(np.mean([r["bytes"] for r in group])),
+            "psnr_db": round(float(np.mean([r["psnr_db"] for r in group])), 2),
+        }
+        for name in profiles:
+            entry[f"upload_s_{name}"] = round(float(np.mean([r[f"upload_s_{name}"] for r in group])), 1)
+        summary.append(entry)
+
+    order = list(FRAMESIZES)
+    summary.sort(key=lambda e: (order.index(e["framesize"]), e["quality"]))
+    return summary
+
+
+def print_summary(summary, profiles, min_psnr=None):
+    """Print the averaged sweep table and, optionally, the cheapest setting per profile."""
+    header = f"{'framesize':20} {'resolution':>10} {'q':>3} {'bytes':>10} {'psnr':>7}"
+    header += "".join(f" {name:>10}" for name in profiles)
+    print(header)
+    print("-" * len(header))
+    for e in summary:
+        line = f"{e['framesize']:20} {e['resolution']:>10} {e['quality']:>3} {e['bytes']:>10,} {e['psnr_db']:>7.2f}"
+        line += "".join(f" {e[f'upload_s_{name}']:>9.1f}s" for name in profiles)
+        print(line)
+
+    if min_psnr is not None:
+        eligible = [e for e in summary if e["psnr_db"] >= min_psnr]
+        print()
+        if not eligible:
+            print(f"No setting reaches {min_psnr} dB PSNR")
+            return
+        best = min(eligible, key=lambda e: e["bytes"])
+        print(f"Smallest setting with PSNR >= {min_psnr} dB: {best['framesize']} ({best['resolution']}) "
+              f"quality {best['quality']}, {best['bytes']:,} bytes")
+        for name in profiles:
+            print(f"  {name:10} ~{best[f'upload_s_{name}']:.1f}s per frame")
+
+
+def parse_profile(text):
+    """Parse a NAME=KBPS[:SETUP_SECONDS] profile argument."""
+    name, _, spec = text.partition("=")
+    kbps, _, setup = spec.partition(":")
+    if not name or not kbps:
+        raise argparse.ArgumentTypeError(f"expected NAME=KBPS[:SETUP], got '{text}'")
+    return name, (float(kbps), float(setup or 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep camera frame sizes and JPEG qualities")
+    parser.add_argument("samples", nargs="+", help="Sample frames (ideally full-resolution captures)")
+    parser.add_argument("--framesizes", help="Comma-separated FRAMESIZE_* names (default: all)")
+    parser.add_argument("--qualities", default=",".join(map(str, DEFAULT_QUALITIES)),
+                        help="Comma-separated JPEG qualities (1-95)")
+    parser.add_argument("--profile", action="append", type=parse_profile, default=[],
+                        help="Bandwidth profile NAME=KBPS[:SETUP]; replaces the built-in profiles")
+    parser.add_argument("--min-psnr", type=float, help="Report the smallest setting at this PSNR")
+    parser.add_argument("--csv", help="Write per-sample results to this CSV file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    framesizes = args.framesizes.split(",") if args.framesizes else list(FRAMESIZES)
+    unknown = [fs for fs in framesizes if fs not in FRAMESIZES]
+    if unknown:
+        parser.error(f"unknown frame size(s): {', '.join(unknown)}")
+    qualities = [int(q) for q in args.qualities.split(",")]
+    profiles = dict(args.profile) or BANDWIDTH_PROFILES
+
+    start = time.perf_counter()
+    rows = run_sweep(args.samples, framesizes, qualities, profiles, args.workers)
+    print(f"Encoded {len(rows)} variants in {time.perf_counter() - start:.1f}s\n")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    print_summary(summarize(rows, profiles), profiles, args.min_psnr)
+
+
+if __name__ == "__main__":
+    main()
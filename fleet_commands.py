@@ -0,0 +1,130 @@
+"""
+Fleet Commands
+Fans one command out to many pumps over a single shared PumpClient connection.
+- Concurrency is capped so a large fleet does not flood the broker or the modems
+- Each device gets its own timeout; one slow device never blocks the others
+- Results are aggregated into a single JSON-serialisable document
+
+Used by the dashboard's /api/fleet admin route; also usable from scripts:
+    async with PumpClient(url) as client:
+        report = await run_fleet_command(client, ["contact", "shey"], "PUMP OFF")
+"""
+
+import time
+import asyncio
+import fnmatch
+
+from pump_client import RpcError
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_CONCURRENCY = 20
+DEFAULT_DEVICE_TIMEOUT = 10.0
+MAX_CONCURRENCY = 200
+
+FLEET_COMMANDS = (
+    "status",
+    "PUMP ON",
+    "PUMP OFF",
+    "schedule.add",
+    "schedule.delete",
+    "schedule.toggle",
+    "schedule.list",
+)
+
+
+class FleetCommandError(ValueError):
+    """Raised for an invalid selector or command."""
+
+
+# =============================================================================
+# DEVICE SELECTION
+# =============================================================================
+
+def resolve_devices(selector, known_devices):
+    """
+    Resolve a device selector to a sorted list of device ids.
+    Selector keys (combined as a union):
+    - "all": true           -> every known device
+    - "devices": [ids]      -> explicit ids (need not be known yet, but must be
+                               usable as one topic level: no "/", "+" or "#")
+    - "match": "glob"       -> known devices matching a shell-style pattern
+    """
+    if not isinstance(selector, dict):
+        raise FleetCommandError("selector must be an object")
+
+    known = [d.lower() for d in known_devices]
+    selected = set()
+    if selector.get("all"):
+        selected.update(known)
+    if selector.get("devices"):
+        if not isinstance(selector["devices"], list):
+            raise FleetCommandError("selector.devices must be a list")
+        devices = [str(d).lower() for d in selector["devices"]]
+        invalid = [d for d in devices if not d or any(c in d for c in "/+#")]
+        if invalid:
+            raise FleetCommandError(f"invalid device ids: {', '.join(map(repr, invalid))}")
+        selected.update(devices)
+    if selector.get("match"):
+        selected.update(fnmatch.filter(known, str(selector["match"]).lower()))
+
+    if not selected:
+        raise FleetCommandError("selector matched no devices")
+    return sorted(selected)
+
+
+# =============================================================================
+# FAN-OUT
+# =============================================================================
+
+async def _send(client, device, command, params, timeout):
+    if command == "status":
+        return await client.status(device, timeout)
+    if command == "PUMP ON":
+        return await client.pump_on(device, timeout)
+    if command == "PUMP OFF":
+        return await client.pump_off(device, timeout)
+    return await client.rpc(device, command, params, timeout)
+
+
+async def run_fleet_command(client, devices, command, params=None,
+                            concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_DEVICE_TIMEOUT):
+    """Run command on every device with at most `concurrency` in flight; return the aggregate."""
+    if command not in FLEET_COMMANDS:
+        raise FleetCommandError(f"unsupported command '{command}'")
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(device):
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                result = await _send(client, device, command, params, timeout)
+                entry = {"ok": True, "result": result}
+            except asyncio.TimeoutError:
+                entry = {"ok": False, "error": f"timeout after {timeout}s"}
+            except RpcError as e:
+                entry = {"ok": False, "error": str(e)}
+            except Exception as e:
+                # Broker or client failure for this device; the others still get reported
+                entry = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            entry["elapsed_ms"] = round((time.monotonic() - start) * 1000)
+            return device, entry
+
+    start = time.monotonic()
+    results = dict(await asyncio.gather(*(one(d) for d in devices)))
+    succeeded = sum(1 for r in results.values() if r["ok"])
+
+    return {
+        "command": command,
+        "params": params,
+        "requested": len(devices),
+        "succeeded": succeeded,
+        "failed": len(devices) - succeeded,
+        "concurrency": concurrency,
+        "timeout": timeout,
+        "elapsed_ms": round((time.monotonic() - start) * 1000),
+        "results": results,
+    }
@@ -0,0 +1,176 @@
+"""
+Heartbeat Codec
+Reads pump status heartbeats in either wire format, so the backend can follow
+a fleet part way through moving from JSON to the compact binary heartbeat
+(CONFIG_BINARY_HEARTBEAT in main/Kconfig.projbuild).
+- JSON, as every firmware sends it today (~100 bytes):
+    {"method":"status.notify","params":{"status":"online","pump_status":true,"firmware_version":"1.0.12"}}
+- Binary, 6 bytes little-endian on the same pump/<device>/status topic:
+    magic 0xB1 | flags (bit 0 online, bit 1 pump on) | major | minor | patch (uint16)
+  A JSON payload always starts with "{", so the first byte tells them apart
+- decode() turns either into the JSON record above; consumers keep reading
+  data["method"] and data["params"] and never see which format arrived
+- decode_columns() / decode_batch() decode many payloads at once: binary ones
+  are viewed through one NumPy structured array, JSON ones parsed as before
+
+The retained online message sent on connect and the offline message stay
+JSON, so they still carry the full version string.
+
+Usage:
+    from heartbeat_codec import decode
+    data = decode(message.payload)      # ValueError if neither format
+    python heartbeat_codec.py --bench 200000
+
+Requires numpy.
+"""
+
+import json
+import time
+import argparse
+from itertools import compress
+
+import numpy as np
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+HEARTBEAT_MAGIC = 0xB1
+FLAG_ONLINE = 0x01
+FLAG_PUMP_ON = 0x02
+
+HEARTBEAT_DTYPE = np.dtype([
+    ("magic", "u1"),
+    ("flags", "u1"),
+    ("major", "u1"),
+    ("minor", "u1"),
+    ("patch", "<u2"),
+])
+HEARTBEAT_SIZE = HEARTBEAT_DTYPE.itemsize
+
+# Heartbeat period of the firmware (heartbeat_init in main/main.c)
+HEARTBEAT_SECONDS = 30
+
+
+# =============================================================================
+# CODEC
+# =============================================================================
+
+def encode(pump_status, firmware_version, online=True):
+    """Binary heartbeat as the firmware builds it."""
+    parts = [int(p) for p in firmware_version.split("+")[0].split(".")[:3]]
+    major, minor, patch = parts + [0] * (3 - len(parts))
+    flags = (FLAG_ONLINE if online else 0) | (FLAG_PUMP_ON if pump_status else 0)
+    return np.array([(HEARTBEAT_MAGIC, flags, major, minor, patch)], dtype=HEARTBEAT_DTYPE).tobytes()
+
+
+def is_binary(payload):
+    return len(payload) == HEARTBEAT_SIZE and payload[0] == HEARTBEAT_MAGIC
+
+
+def _record(online, pump_status, firmware_version):
+    if not online:
+        return {"method": "status.notify", "params": {"status": "offline"}}
+    return {"method": "status.notify", "params": {
+        "status": "online", "pump_status": pump_status, "firmware_version": firmware_version}}
+
+
+def decode(payload):
+    """A status payload in either format as its JSON record; raises ValueError if it is neither."""
+    if is_binary(payload):
+        _, flags, major, minor, patch = np.frombuffer(payload, HEARTBEAT_DTYPE)[0].tolist()
+        return _record(bool(flags & FLAG_ONLINE), bool(flags & FLAG_PUMP_ON), f"{major}.{minor}.{patch}")
+    return json.loads(payload)
+
+
+def decode_columns(payloads):
+    """
+    Binary heartbeats among payloads as columns: (index, online, pump_status,
+    firmware_version), index being each one's position in payloads.
+    """
+    sizes = np.fromiter(map(len, payloads), dtype=np.int64, count=len(payloads))
+    index = np.flatnonzero(sizes == HEARTBEAT_SIZE)
+    rows = np.frombuffer(b"".join(compress(payloads, sizes == HEARTBEAT_SIZE)), HEARTBEAT_DTYPE)
+    valid = rows["magic"] == HEARTBEAT_MAGIC
+    index, rows = index[valid], rows[valid]
+
+    # A fleet runs a handful of versions: format each once
+    packed = (rows["major"].astype(np.uint32) << 24) | (rows["minor"].astype(np.uint32) << 16) | rows["patch"]
+    versions, inverse = np.unique(packed, return_inverse=True)
+    names = np.array([f"{v >> 24}.{(v >> 16) & 0xFF}.{v & 0xFFFF}" for v in versions.tolist()], dtype=object)
+    return (index, (rows["flags"] & FLAG_ONLINE).astype(bool), (rows["flags"] & FLAG_PUMP_ON).astype(bool),
+            names[inverse.reshape(-1)])
+
+
+def decode_batch(payloads):
+    """Records for a list of payloads in either format; None where one is neither."""
+    records = [None] * len(payloads)
+    index, online, pump_status, firmware_version = decode_columns(payloads)
+    for i, up, pump, version in zip(index.tolist(), online.tolist(), pump_status.tolist(),
+                                    firmware_version.tolist()):
+        records[i] = _record(up, pump, version)
+    for i, payload in enumerate(payloads):
+        if records[i] is None:
+            try:
+                records[i] = json.loads(payload)
+            except ValueError:
+                pass
+    return records
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def benchmark(count, device="shey", firmware_version="1.0.12", tls=False):
+    """Bytes per device per month for each format, and decode throughput over `count` heartbeats."""
+    from data_usage import link_overhead
+
+    topic = f"pump/{device}/status"
+    as_json = json.dumps(_record(True, True, firmware_version), separators=(",", ":")).encode()
+    as_binary = encode(True, firmware_version)
+    assert decode(as_binary) == json.loads(as_json)
+
+    per_month = 30 * 86400 // HEARTBEAT_SECONDS
+    print(f"heartbeats per device per month: {per_month:,}" + (" (TLS)" if tls else ""))
+    print(f"{'format':<8} {'payload':>8} {'on link':>8} {'MB/month':>9}")
+    link = {}
+    for name, payload in (("json", as_json), ("binary", as_binary)):
+        link[name] = len(payload) + link_overhead(len(topic), len(payload), tls=tls)
+        print(f"{name:<8} {len(payload):>8} {link[name]:>8} {link[name] * per_month / 1e6:>9.2f}")
+    saved = link["json"] - link["binary"]
+    print(f"saved: {len(as_json) - len(as_binary)} B payload, {saved} B on the link per heartbeat, "
+          f"{saved * per_month / 1e6:.2f} MB per device per month ({saved / link['json']:.0%})")
+
+    rng = np.random.default_rng(1)
+    pump = rng.random(count) < 0.3
+    versions = rng.choice(["1.0.9", "1.0.12", "1.1.0"], count)
+    binary = [encode(p, v) for p, v in zip(pump.tolist(), versions.tolist())]
+    text = [json.dumps(_record(True, p, v), separators=(",", ":")).encode()
+            for p, v in zip(pump.tolist(), versions.tolist())]
+    mixed = [b if i % 2 else t for i, (b, t) in enumerate(zip(binary, text))]
+
+    for name, run in (("json.loads, JSON", lambda: [json.loads(p) for p in text]),
+                      ("decode_batch, JSON", lambda: decode_batch(text)),
+                      ("decode_batch, binary", lambda: decode_batch(binary)),
+                      ("decode_batch, mixed", lambda: decode_batch(mixed)),
+                      ("decode_columns, binary", lambda: decode_columns(binary))):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24} {count / elapsed:>12,.0f} heartbeats/s")
+    assert decode_batch(binary) == [json.loads(p) for p in text]
+    assert decode_batch(mixed) == [json.loads(p) for p in text]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and binary pump heartbeats")
+    parser.add_argument("--bench", type=int, default=200000, metavar="HEARTBEATS", help="Heartbeats to decode")
+    parser.add_argument("--version", default="1.0.12", help="Firmware version in the heartbeat")
+    parser.add_argument("--tls", action="store_true", help="Count TLS record overhead (mqtts:// devices)")
+    args = parser.parse_args()
+    benchmark(args.bench, firmware_version=args.version, tls=args.tls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+History Export
+Exports recorded device history (device_history.py) as CSV or Parquet for
+audits, over ranges of months, with flat memory use.
+- A generator pipeline: SQLite cursor -> batches of EXPORT_BATCH_ROWS rows ->
+  encoded chunks -> file or chunked HTTP response; no stage holds more than
+  one batch, however long the range
+- Segments stream off the (device, end) index in device order, so SQLite does
+  not sort the range first
+- One row per run of identical heartbeats: device, start, end (UTC), seconds,
+  pump_status, clipped to the requested local dates
+- CSV is written chunk by chunk; Parquet as one row group per batch
+- Rows per second are printed by the CLI and logged by the service
+
+The Lambda buffers whole responses, so long exports go through --serve
+(/api/export, dashboard session cookies): admins may export any devices,
+other users their own.
+
+Usage:
+    python history_export.py --db pump_history.db --from 2026-07-01 --to 2026-09-30 --out q3.csv
+    python history_export.py --format parquet --devices contact,shey --out q3.parquet
+    python history_export.py --serve --port 8083
+    GET /api/export?from=2026-07-01&to=2026-09-30&format=parquet&devices=contact,shey
+
+Requires numpy and aiohttp; pyarrow for Parquet.
+"""
+
+import io
+import csv
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web
+
+from dashboard_lambda import authenticate, session_secret_configured
+from device_history import HistoryStore, HISTORY_DB
+from pump_analytics import REPORT_TZ_OFFSET, DAY, day_number
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Segments read from SQLite and encoded per step
+EXPORT_BATCH_ROWS = 50000
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+COLUMNS = ("device", "start", "end", "seconds", "pump_status")
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+def export_range(date_from, date_to):
+    """Unix [start, end) of local dates date_from..date_to inclusive."""
+    first_day, last_day = day_number(date_from), day_number(date_to)
+    if last_day < first_day:
+        raise ValueError("'to' must not be before 'from'")
+    return first_day * DAY - REPORT_TZ_OFFSET, (last_day + 1) * DAY - REPORT_TZ_OFFSET
+
+
+def read_batches(store, start, end, devices=None, batch=EXPORT_BATCH_ROWS, stats=None):
+    """
+    Yield column batches (devices, start, end, seconds, pump_status) clipped to
+    [start, end); times are datetime64[ms] UTC.
+    """
+    for rows in store.iter_segments(start, end, devices, batch):
+        device, seg_start, seg_end, status = zip(*rows)
+        seg_start = np.clip(np.array(seg_start), start, end)
+        seg_end = np.clip(np.array(seg_end), start, end)
+        if stats is not None:
+            stats["rows"] += len(rows)
+        yield (device, np.round(seg_start * 1000).astype("datetime64[ms]"),
+               np.round(seg_end * 1000).astype("datetime64[ms]"),
+               np.round(seg_end - seg_start, 3), np.array(status, dtype=bool))
+
+
+def csv_chunks(batches):
+    """Yield UTF-8 CSV, the header first and then one chunk per batch."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    yield buf.getvalue().encode()
+    for device, start, end, seconds, status in batches:
+        buf.seek(0)
+        buf.truncate()
+        # Timestamps formatted by NumPy a column at a time: 2026-07-01T00:00:00.000Z
+        writer.writerows(zip(device, np.char.add(start.astype(str), "Z").tolist(),
+                             np.char.add(end.astype(str), "Z").tolist(), seconds.tolist(),
+                             np.where(status, "ON", "OFF").tolist()))
+        yield buf.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what ParquetWriter writes until it is taken."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def parquet_chunks(batches):
+    """Yield a Parquet file in pieces, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("device", pa.string()),
+        ("start", pa.timestamp("ms", tz="UTC")),
+        ("end", pa.timestamp("ms", tz="UTC")),
+        ("seconds", pa.float64()),
+        ("pump_status", pa.bool_()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for device, start, end, seconds, status in batches:
+        table = pa.table({
+            "device": pa.array(device, pa.string()),
+            "start": pa.array(start.astype(np.int64), pa.timestamp("ms", tz="UTC")),
+            "end": pa.array(end.astype(np.int64), pa.timestamp("ms", tz="UTC")),
+            "seconds": pa.array(seconds, pa.float64()),
+            "pump_status": pa.array(status, pa.bool_()),
+        }, schema=schema)
+        writer.write_table(table)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_chunks(store, date_from, date_to, fmt="csv", devices=None, stats=None):
+    """Encoded chunks of an export; stats (if given) collects rows and bytes as they pass."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use {', '.join(FORMATS)}")
+    start, end = export_range(date_from, date_to)
+    batches = read_batches(store, start, end, devices, stats=stats)
+    for chunk in (parquet_chunks if fmt == "parquet" else csv_chunks)(batches):
+        if stats is not None:
+            stats["bytes"] += len(chunk)
+        yield chunk
+
+
+def write_export(store, path, date_from, date_to, fmt="csv", devices=None):
+    """Write an export to path; returns stats with rows, bytes and rows_per_second."""
+    stats = {"rows": 0, "bytes": 0}
+    started = time.perf_counter()
+    with open(path, "wb") as f:
+        for chunk in export_chunks(store, date_from, date_to, fmt, devices, stats):
+            f.write(chunk)
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = stats["rows"] / max(stats["seconds"], 1e-9)
+    return stats
+
+
+# =============================================================================
+# SERVICE
+# =============================================================================
+
+class ExportService:
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+
+    async def handle_export(self, request):
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(None, authenticate, dict(request.cookies))
+        if user is None:
+            raise web.HTTPUnauthorized(text="Not authenticated")
+        _, user_device, is_admin = user
+
+        fmt = request.query.get("format", "csv")
+        devices = request.query.get("devices")
+        devices = [d.strip().lower() for d in devices.split(",") if d.strip()] if devices else None
+        if not is_admin:
+            if devices and devices != [user_device.lower()]:
+                raise web.HTTPForbidden(text="Access denied")
+            devices = [user_device.lower()]
+        try:
+            date_from, date_to = request.query["from"], request.query["to"]
+            export_range(date_from, date_to)
+            if fmt not in FORMATS:
+                raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        except (KeyError, ValueError) as e:
+            raise web.HTTPBadRequest(text=f"Expected from, to (YYYY-MM-DD) and format: {e}")
+
+        store = HistoryStore(self.db_path, readonly=True)
+        stats = {"rows": 0, "bytes": 0}
+        chunks = export_chunks(store, date_from, date_to, fmt, devices, stats)
+        response = web.StreamResponse(headers={
+            "Content-Type": FORMATS[fmt],
+            "Content-Disposition": f'attachment; filename="pump_history_{date_from}_{date_to}.{fmt}"',
+        })
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        started = time.perf_counter()
+        # SQLite reads and encoding run in the export's own thread, one chunk at a time;
+        # closing is queued behind a chunk still being read when the client goes away
+        worker = ThreadPoolExecutor(1, thread_name_prefix="export")
+        try:
+            while True:
+                chunk = await loop.run_in_executor(worker, next, chunks, None)
+                if chunk is None:
+                    break
+                await response.write(chunk)
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        finally:
+            worker.submit(chunks.close)
+            worker.submit(store.close)
+            worker.shutdown(wait=False)
+            elapsed = time.perf_counter() - started
+            print(f"export {date_from}..{date_to} {fmt} for {user[0]}: {stats['rows']:,} rows, "
+                  f"{stats['bytes']:,} bytes, {stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s")
+        return response
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/api/export", self.handle_export)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export recorded pump history as CSV or Parquet")
+    parser.add_argument("--db", default=HISTORY_DB, help="History database (device_history.py)")
+    parser.add_argument("--from", dest="date_from", help="First local date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Last local date (YYYY-MM-DD)")
+    parser.add_argument("--devices", help="Comma-separated devices (default: all)")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="Output format (default: from --out)")
+    parser.add_argument("--out", help="Output file")
+    parser.add_argument("--serve", action="store_true", help="Serve /api/export instead")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8083)
+    args = parser.parse_args()
+
+    if args.serve:
+        if not session_secret_configured():
+            parser.error("SESSION_SECRET must be set to the dashboard Lambda's value (at least 32 characters)")
+        web.run_app(ExportService(args.db).app(), host=args.host, port=args.port)
+        return
+
+    if not (args.date_from and args.date_to and args.out):
+        parser.error("--from, --to and --out are required")
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    devices = [d.strip() for d in args.devices.split(",")] if args.devices else None
+    stats = write_export(HistoryStore(args.db, readonly=True), args.out, args.date_from, args.date_to, fmt, devices)
+    print(f"{stats['rows']:,} rows, {stats['bytes']:,} bytes to {args.out} in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
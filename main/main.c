@@ -95,6 +95,10 @@ static struct device_state s_device_state = {false, PROJECT_VERSION};
 // Scheduler structures
 #define MAX_SCHEDULES 10
 
+// Longest request "id" token echoed in replies, quotes included; longer ids are
+// answered with null. The dashboard and pump_client.py send ids under 24 bytes.
+#define RPC_ID_MAX 40
+
 
 
 
@@ -168,20 +172,49 @@ static char *make_topic_name(char *buf, size_t len, const char *suffix) {
 }
 
 
+#ifdef CONFIG_BINARY_HEARTBEAT
+// Binary heartbeat, little-endian (heartbeat_codec.py decodes it):
+// magic 0xB1 | flags (bit 0 online, bit 1 pump on) | major | minor | patch (uint16)
+#define HEARTBEAT_MAGIC 0xB1
+#define HEARTBEAT_FLAG_ONLINE 0x01
+#define HEARTBEAT_FLAG_PUMP_ON 0x02
+
+static size_t encode_heartbeat(uint8_t *buf) {
+  unsigned major = 0, minor = 0, patch = 0;
+  sscanf(s_device_state.firmware_version, "%u.%u.%u", &major, &minor, &patch);
+  buf[0] = HEARTBEAT_MAGIC;
+  buf[1] = HEARTBEAT_FLAG_ONLINE | (s_device_state.pump_status ? HEARTBEAT_FLAG_PUMP_ON : 0);
+  buf[2] = (uint8_t) major;
+  buf[3] = (uint8_t) minor;
+  buf[4] = (uint8_t) (patch & 0xFF);
+  buf[5] = (uint8_t) (patch >> 8);
+  return 6;
+}
+#endif
+
 static void publish_status(struct mg_connection *c) {
   char topic[100];
-  char json[256];
   struct mg_mqtt_opts pub_opts;
+#ifdef CONFIG_BINARY_HEARTBEAT
+  uint8_t heartbeat[6];
+  size_t len = encode_heartbeat(heartbeat);
+#else
+  char json[256];
   
   snprintf(json, sizeof(json),
     "{\"method\":\"status.notify\",\"params\":{\"status\":\"online\","
     "\"pump_status\":%s,\"firmware_version\":\"%s\"}}",
     s_device_state.pump_status ? "true" : "false", 
     s_device_state.firmware_version);
+#endif
 
   memset(&pub_opts, 0, sizeof(pub_opts));
   pub_opts.topic = mg_str(make_topic_name(topic, sizeof(topic), "status"));
+#ifdef CONFIG_BINARY_HEARTBEAT
+  pub_opts.message = mg_str_n((const char *) heartbeat, len);
+#else
   pub_opts.message = mg_str(json);
+#endif
   pub_opts.qos = s_qos;
   pub_opts.retain = false;  // ✅ CHANGE: Don't retain heartbeats
   mg_mqtt_pub(c, &pub_opts);
@@ -313,11 +346,27 @@ static void scheduler_init(void) {
   ESP_LOGD(TAG_SCHED, "Scheduler initialized (10s check interval)");
 }
 
+// Copy the request "id" token so replies can echo it ("null" if absent)
+static void rpc_request_id(struct mg_rpc_req *r, char *buf, size_t len) {
+  int toklen = 0;
+  int ofs = mg_json_get(r->frame, "$.id", &toklen);
+  if (ofs < 0 || toklen <= 0 || (size_t) toklen >= len) {
+    if (toklen > 0) ESP_LOGW(TAG, "Request id too long (%d bytes), replying with null", toklen);
+    snprintf(buf, len, "null");
+    return;
+  }
+  memcpy(buf, r->frame.buf + ofs, toklen);
+  buf[toklen] = '\0';
+}
+
 // Add a new schedule
 static void rpc_schedule_add(struct mg_rpc_req *r) {
+  char req_id[RPC_ID_MAX];
+  rpc_request_id(r, req_id, sizeof(req_id));
+
   if (s_schedule_count >= MAX_SCHEDULES) {
     char response[128];
-    snprintf(response, sizeof(response), "{\"id\":null,\"error\":\"Maximum schedules reached\"}");
+    snprintf(response, sizeof(response), "{\"id\":%s,\"error\":\"Maximum schedules reached\"}", req_id);
 
     if (s_mqtt_connection) {
       char topic[100];
@@ -339,7 +388,7 @@ static void rpc_schedule_add(struct mg_rpc_req *r) {
   // Validation: start_time must be positive (valid Unix timestamp)
   if (start_time <= 0) {
     char response[128];
-    snprintf(response, sizeof(response), "{\"id\":null,\"error\":\"Invalid start_time: must be positive\"}");
+    snprintf(response, sizeof(response), "{\"id\":%s,\"error\":\"Invalid start_time: must be positive\"}", req_id);
     if (s_mqtt_connection) {
       char topic[100];
       struct mg_mqtt_opts pub_opts;
@@ -355,7 +404,7 @@ static void rpc_schedule_add(struct mg_rpc_req *r) {
   // Validation: duration must be between 1 second and 24 hours (86400 seconds)
   if (duration <= 0 || duration > 86400) {
     char response[128];
-    snprintf(response, sizeof(response), "{\"id\":null,\"error\":\"Invalid duration: must be 1-86400 seconds\"}");
+    snprintf(response, sizeof(response), "{\"id\":%s,\"error\":\"Invalid duration: must be 1-86400 seconds\"}", req_id);
     if (s_mqtt_connection) {
       char topic[100];
       struct mg_mqtt_opts pub_opts;
@@ -371,7 +420,7 @@ static void rpc_schedule_add(struct mg_rpc_req *r) {
   // Validation: interval must be 0 (one-time) or at least equal to duration
   if (interval < 0 || (interval > 0 && interval < duration)) {
     char response[128];
-    snprintf(response, sizeof(response), "{\"id\":null,\"error\":\"Invalid interval: must be 0 or >= duration\"}");
+    snprintf(response, sizeof(response), "{\"id\":%s,\"error\":\"Invalid interval: must be 0 or >= duration\"}", req_id);
     if (s_mqtt_connection) {
       char topic[100];
       struct mg_mqtt_opts pub_opts;
@@ -400,7 +449,7 @@ static void rpc_schedule_add(struct mg_rpc_req *r) {
   
   // Send success response
   char response[128];
-  snprintf(response, sizeof(response), "{\"id\":null,\"result\":\"ok\"}");
+  snprintf(response, sizeof(response), "{\"id\":%s,\"result\":\"ok\"}", req_id);
   
   if (s_mqtt_connection) {
     char topic[100];
@@ -415,6 +464,8 @@ static void rpc_schedule_add(struct mg_rpc_req *r) {
 
 // Delete a schedule
 static void rpc_schedule_delete(struct mg_rpc_req *r) {
+  char req_id[RPC_ID_MAX];
+  rpc_request_id(r, req_id, sizeof(req_id));
   uint32_t id = mg_json_get_long(r->frame, "$.params.id", 0);
   
   for (int i = 0; i < s_schedule_count; i++) {
@@ -429,7 +480,7 @@ static void rpc_schedule_delete(struct mg_rpc_req *r) {
       
       // Send response
       char response[128];
-      snprintf(response, sizeof(response), "{\"id\":null,\"result\":\"ok\"}");
+      snprintf(response, sizeof(response), "{\"id\":%s,\"result\":\"ok\"}", req_id);
       
       if (s_mqtt_connection) {
         char topic[100];
@@ -446,7 +497,7 @@ static void rpc_schedule_delete(struct mg_rpc_req *r) {
   
   // Not found
   char response[128];
-  snprintf(response, sizeof(response), "{\"id\":null,\"error\":\"Schedule not found\"}");
+  snprintf(response, sizeof(response), "{\"id\":%s,\"error\":\"Schedule not found\"}", req_id);
   
   if (s_mqtt_connection) {
     char topic[100];
@@ -461,6 +512,8 @@ static void rpc_schedule_delete(struct mg_rpc_req *r) {
 
 // Toggle schedule enabled/disabled
 static void rpc_schedule_toggle(struct mg_rpc_req *r) {
+  char req_id[RPC_ID_MAX];
+  rpc_request_id(r, req_id, sizeof(req_id));
   uint32_t id = mg_json_get_long(r->frame, "$.params.id", 0);
   bool enabled = false;
   mg_json_get_bool(r->frame, "$.params.enabled", &enabled);
@@ -472,7 +525,7 @@ static void rpc_schedule_toggle(struct mg_rpc_req *r) {
       
       // Send response
       char response[128];
-      snprintf(response, sizeof(response), "{\"id\":null,\"result\":\"ok\"}");
+      snprintf(response, sizeof(response), "{\"id\":%s,\"result\":\"ok\"}", req_id);
       
       if (s_mqtt_connection) {
         char topic[100];
@@ -489,7 +542,7 @@ static void rpc_schedule_toggle(struct mg_rpc_req *r) {
   
   // Not found
   char response[128];
-  snprintf(response, sizeof(response), "{\"id\":null,\"error\":\"Schedule not found\"}");
+  snprintf(response, sizeof(response), "{\"id\":%s,\"error\":\"Schedule not found\"}", req_id);
   
   if (s_mqtt_connection) {
     char topic[100];
@@ -504,13 +557,16 @@ static void rpc_schedule_toggle(struct mg_rpc_req *r) {
 
 // List all schedules
 static void rpc_schedule_list(struct mg_rpc_req *r) {
-  char json[1024];
-  int offset = 0;
+  char req_id[RPC_ID_MAX];
+  rpc_request_id(r, req_id, sizeof(req_id));
+  // Room for the id and MAX_SCHEDULES entries at their longest (~150 bytes each)
+  char json[64 + RPC_ID_MAX + MAX_SCHEDULES * 160];
+  size_t offset = 0;
   
   offset += snprintf(json + offset, sizeof(json) - offset,
-                     "{\"id\":null,\"result\":{\"schedules\":[");
+                     "{\"id\":%s,\"result\":{\"schedules\":[", req_id);
   
-  for (int i = 0; i < s_schedule_count; i++) {
+  for (int i = 0; i < s_schedule_count && offset < sizeof(json); i++) {
     pump_schedule_t *s = &s_schedules[i];
     offset += snprintf(json + offset, sizeof(json) - offset,
                        "%s{\"id\":%lu,\"start\":%lld,\"duration\":%lu,"
@@ -521,7 +577,14 @@ static void rpc_schedule_list(struct mg_rpc_req *r) {
                        s->last_run);
   }
   
-  offset += snprintf(json + offset, sizeof(json) - offset, "]}}");
+  if (offset < sizeof(json)) {
+    offset += snprintf(json + offset, sizeof(json) - offset, "]}}");
+  }
+  // snprintf returns the length it wanted: never publish past the buffer
+  if (offset >= sizeof(json)) {
+    ESP_LOGE(TAG_SCHED, "Schedule list truncated");
+    offset = sizeof(json) - 1;
+  }
 
   ESP_LOGD(TAG_SCHED, "Listing %d schedules", s_schedule_count);
   
@@ -549,6 +612,8 @@ static void publish_response(struct mg_connection *c, char *buf, size_t len) {
 
 
 static void rpc_ota_upload(struct mg_rpc_req *r) {
+  char req_id[RPC_ID_MAX];
+  rpc_request_id(r, req_id, sizeof(req_id));
   long ofs = mg_json_get_long(r->frame, "$.params.offset", -1);
   long tot = mg_json_get_long(r->frame, "$.params.total", -1);
   int len = 0;
@@ -561,8 +626,8 @@ static void rpc_ota_upload(struct mg_rpc_req *r) {
     
     char response[128];
     snprintf(response, sizeof(response), 
-      "{\"method\":\"ota.ack\",\"params\":{\"offset\":%ld,\"status\":\"error\"}}",
-      ofs);
+      "{\"id\":%s,\"method\":\"ota.ack\",\"params\":{\"offset\":%ld,\"status\":\"error\"}}",
+      req_id, ofs);
     
     if (s_mqtt_connection) {
       char topic[100];
@@ -604,7 +669,8 @@ static void rpc_ota_upload(struct mg_rpc_req *r) {
         
         char complete_msg[128];
         snprintf(complete_msg, sizeof(complete_msg), 
-          "{\"method\":\"ota.complete\",\"params\":{\"status\":\"success\"}}");
+          "{\"id\":%s,\"method\":\"ota.complete\",\"params\":{\"status\":\"success\"}}",
+          req_id);
         
         if (s_mqtt_connection) {
           char topic[100];
@@ -634,8 +700,8 @@ static void rpc_ota_upload(struct mg_rpc_req *r) {
         // ✅ Regular chunk - send ACK
         char response[128];
         snprintf(response, sizeof(response), 
-          "{\"method\":\"ota.ack\",\"params\":{\"offset\":%ld,\"status\":\"ok\"}}",
-          ofs);
+          "{\"id\":%s,\"method\":\"ota.ack\",\"params\":{\"offset\":%ld,\"status\":\"ok\"}}",
+          req_id, ofs);
         
         if (s_mqtt_connection) {
           char topic[100];
@@ -652,8 +718,8 @@ static void rpc_ota_upload(struct mg_rpc_req *r) {
       // Send error response
       char response[128];
       snprintf(response, sizeof(response), 
-        "{\"method\":\"ota.ack\",\"params\":{\"offset\":%ld,\"status\":\"error\"}}",
-        ofs);
+        "{\"id\":%s,\"method\":\"ota.ack\",\"params\":{\"offset\":%ld,\"status\":\"error\"}}",
+        req_id, ofs);
       
       if (s_mqtt_connection) {
         char topic[100];
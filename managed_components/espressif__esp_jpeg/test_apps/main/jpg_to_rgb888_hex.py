@@ -1,63 +1,301 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from PIL import Image
 
+# Output formats, matching the esp_jpeg decoder output modes:
+#   rgb888   - JPEG_IMAGE_FORMAT_RGB888, one 0xRRGGBB word per pixel
+#   rgb565le - JPEG_IMAGE_FORMAT_RGB565, low byte first (swap_color_bytes = 0)
+#   rgb565be - JPEG_IMAGE_FORMAT_RGB565, high byte first (swap_color_bytes = 1)
+FORMATS = ("rgb888", "rgb565le", "rgb565be")
+
+# Image rows converted and written per step; bounds the output text held in memory
+ROWS_PER_CHUNK = 64
+
+# Values per output line for byte-array formats
+BYTES_PER_LINE = 16
+
+_HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
 
-def jpg_to_rgb888_hex_c_array(input_filename: str, output_filename: str) -> str:
+def _hex_lines(values: np.ndarray, digits: int, per_line: int) -> bytes:
     """
-    Convert a .jpg file to RGB888 hex data and format it as a C-style array.
+    Format integers as indented C hex literals, each followed by a comma.
+
+    Parameters:
+    values (np.ndarray): Unsigned integer values to format.
+    digits (int): Number of hex digits per value.
+    per_line (int): Number of values on each output line.
+
+    Returns:
+    bytes: ASCII text, one complete line per `per_line` values.
+    """
+    indent = 4
+    width = indent + 2 + digits + 2  # indent, "0x", digits, ",", separator
+    cells = np.empty((len(values), width), dtype=np.uint8)
+    cells[:, :indent] = ord(" ")
+    cells[:, indent] = ord("0")
+    cells[:, indent + 1] = ord("x")
+    for i in range(digits):
+        shift = 4 * (digits - 1 - i)
+        cells[:, indent + 2 + i] = _HEX_DIGITS[(values >> shift) & 0xF]
+    cells[:, -2] = ord(",")
+    cells[:, -1] = ord(" ")
+    cells[per_line - 1::per_line, -1] = ord("\n")
+    cells[-1, -1] = ord("\n")
+
+    # Only the first value on each line keeps its indent
+    keep = np.ones(cells.shape, dtype=bool)
+    not_first = np.ones(len(values), dtype=bool)
+    not_first[::per_line] = False
+    keep[not_first, :indent] = False
+    return cells[keep].tobytes()
+
+
+def _convert_rows(rgb: np.ndarray, fmt: str) -> np.ndarray:
+    """
+    Convert a block of RGB pixels to the values emitted for an output format.
+
+    Parameters:
+    rgb (np.ndarray): uint8 array of shape (rows, width, 3).
+    fmt (str): One of FORMATS.
+
+    Returns:
+    np.ndarray: Flat uint32 array of output values in decoder memory order.
+    """
+    r, g, b = (rgb[..., i].astype(np.uint32) for i in range(3))
+    if fmt == "rgb888":
+        return ((r << 16) | (g << 8) | b).ravel()
+
+    # Same packing as jpeg_decode_out_cb() in jpeg_decoder.c
+    color = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+    lo, hi = color & 0xFF, color >> 8
+    pair = (hi, lo) if fmt == "rgb565be" else (lo, hi)
+    return np.stack(pair, axis=-1).ravel()
+
+
+def jpg_to_hex_c_array(input_filename: str, output_filename: str, fmt: str = "rgb888",
+                       name: str = "image_data", rows_per_chunk: int = ROWS_PER_CHUNK,
+                       stamp: str = None) -> int:
+    """
+    Convert a .jpg file to decoder output data and write it as a C-style array.
+
+    The image is decoded once, then converted ROWS_PER_CHUNK rows at a time with
+    NumPy and written incrementally: memory holds the decoded image and one chunk
+    of output, never the whole output text.
 
     Parameters:
     input_filename (str): The path to the JPEG file.
+    output_filename (str): The path of the C source file to write.
+    fmt (str): Output format, one of FORMATS.
+    name (str): Name of the C array.
+    rows_per_chunk (int): Image rows converted per step.
+    stamp (str): Optional text written as a leading C comment line.
 
     Returns:
-    str: A string representing the RGB888 hex data formatted as a C array.
+    int: The number of array elements written.
     """
-    # Open the image file
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+
+    if fmt == "rgb888":
+        digits, per_line, ctype, per_pixel = 6, 1, "unsigned int", 1
+    else:
+        digits, per_line, ctype, per_pixel = 2, BYTES_PER_LINE, "unsigned char", 2
+
     with Image.open(input_filename) as img:
-        # Ensure the image is in RGB mode
-        rgb_img = img.convert("RGB")
+        # Ensure the image is in RGB mode; an RGB JPEG is used as decoded, without a copy
+        img.load()
+        rgb_img = img if img.mode == "RGB" else img.convert("RGB")
 
-        # Get image dimensions
-        width, height = rgb_img.size
+    width, height = rgb_img.size
+    count = width * height * per_pixel
 
-        # List to store hex values as C-style entries
-        hex_data = []
+    with open(output_filename, "wb") as file:
+        if stamp:
+            file.write(f"// {stamp}\n".encode())
+        file.write(f"{ctype} {name}[{count}] = {{\n".encode())
 
-        # Iterate over each pixel to get RGB values
-        for y in range(height):
-            for x in range(width):
-                r, g, b = rgb_img.getpixel((x, y))
-                # Format each RGB value as C-style hex (e.g., 0xRRGGBB)
-                hex_data.append(f"0x{r:02X}{g:02X}{b:02X}")
+        pending = np.empty(0, dtype=np.uint32)
+        for top in range(0, height, rows_per_chunk):
+            bottom = min(top + rows_per_chunk, height)
+            rows = np.asarray(rgb_img.crop((0, top, width, bottom)))
+            values = np.concatenate((pending, _convert_rows(rows, fmt)))
 
-    # Format as a C-style array with line breaks for readability
-    hex_array = ",\n    ".join(hex_data)
-    c_array = f"unsigned int image_data[{width * height}] = {{\n    {hex_array}\n}};"
+            # Carry values that do not fill a whole line over to the next chunk
+            if bottom < height:
+                split = len(values) - len(values) % per_line
+                values, pending = values[:split], values[split:]
+                if len(values):
+                    file.write(_hex_lines(values, digits, per_line))
+            else:
+                text = _hex_lines(values, digits, per_line)
+                # No comma after the last element
+                file.write(text[:-2] + b"\n")
 
-    # Write the C array to the output file
-    with open(output_filename, "w") as file:
-        file.write(c_array)
+        file.write(b"};\n")
 
-    print(f"C-style RGB888 hex array saved to {output_filename}")
+    print(f"C-style {fmt} hex array saved to {output_filename}")
 
-    return c_array
+    return count
 
 
-def main():
+def jpg_to_rgb888_hex_c_array(input_filename: str, output_filename: str) -> int:
+    """
+    Convert a .jpg file to RGB888 hex data and format it as a C-style array.
+
+    Kept for existing callers; equivalent to jpg_to_hex_c_array(..., fmt="rgb888").
     """
-    Main function to convert a JPEG file to an RGB888 C-style hex array.
+    return jpg_to_hex_c_array(input_filename, output_filename, "rgb888")
 
-    Instructions:
-    1. Replace 'input.jpg' with the path to your JPEG file.
-    2. Run the script to get the C-style array output.
+
+def fixture_stamp(input_filename: str, fmt: str, name: str) -> str:
     """
-    # Input JPEG file path
-    input_filename = "usb_camera.jpg"  # Replace with your JPEG file path
+    Build the stamp identifying a fixture's source image and conversion parameters.
+
+    Parameters:
+    input_filename (str): The path to the JPEG file.
+    fmt (str): Output format, one of FORMATS.
+    name (str): Name of the C array.
 
-    # Output file path for the C array
-    output_filename = "output_array.c"  # Specify your desired output filename
+    Returns:
+    str: A single line containing the SHA-256 of the source and the parameters.
+    """
+    with open(input_filename, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+    return f"generated by jpg_to_rgb888_hex.py: sha256={digest} format={fmt} name={name}"
+
+
+def is_up_to_date(output_filename: str, stamp: str) -> bool:
+    """Return True if output_filename exists and was generated with the same stamp."""
+    try:
+        with open(output_filename, "r") as file:
+            return file.readline().rstrip("\n") == f"// {stamp}"
+    except FileNotFoundError:
+        return False
+
+
+def load_jobs(source: str, formats: list) -> list:
+    """
+    Collect conversion jobs from a directory of JPEGs or a JSON manifest.
+
+    A directory yields one job per .jpg file and format, written next to the
+    image as test_<stem>_<format>.h with array name <stem>_<format>.
+
+    A manifest is a JSON list of objects with "input", "output" and optional
+    "format" (default rgb888) and "name" keys; paths are relative to the manifest.
+
+    Parameters:
+    source (str): Directory or manifest path.
+    formats (list): Formats to generate for each image in directory mode.
+
+    Returns:
+    list: (input, output, format, name) tuples.
+    """
+    jobs = []
+    if os.path.isdir(source):
+        for entry in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(entry)
+            if ext.lower() not in (".jpg", ".jpeg"):
+                continue
+            for fmt in formats:
+                output = os.path.join(source, f"test_{stem}_{fmt}.h")
+                jobs.append((os.path.join(source, entry), output, fmt, f"{stem}_{fmt}"))
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, "r") as file:
+            for item in json.load(file):
+                fmt = item.get("format", "rgb888")
+                stem = os.path.splitext(os.path.basename(item["input"]))[0]
+                jobs.append((os.path.join(base, item["input"]), os.path.join(base, item["output"]),
+                             fmt, item.get("name", f"{stem}_{fmt}")))
+    return jobs
+
+
+def _run_job(job: tuple) -> tuple:
+    """Convert one batch job unless its output is already up to date."""
+    input_filename, output_filename, fmt, name = job
+    start = time.perf_counter()
+    stamp = fixture_stamp(input_filename, fmt, name)
+    skipped = is_up_to_date(output_filename, stamp)
+    if not skipped:
+        jpg_to_hex_c_array(input_filename, output_filename, fmt, name, stamp=stamp)
+    return output_filename, skipped, time.perf_counter() - start, os.path.getsize(output_filename)
+
+
+def batch_convert(source: str, formats: list, workers: int = None, force: bool = False) -> list:
+    """
+    Convert every job from a directory or manifest across a process pool.
+
+    Outputs whose stamp matches the current source hash and parameters are skipped.
+
+    Parameters:
+    source (str): Directory or manifest path, see load_jobs().
+    formats (list): Formats to generate in directory mode.
+    workers (int): Number of worker processes (default: CPU count).
+    force (bool): Regenerate outputs even if they are up to date.
+
+    Returns:
+    list: (output, skipped, seconds, bytes) tuples, one per job.
+    """
+    jobs = load_jobs(source, formats)
+    if force:
+        for job in jobs:
+            if os.path.exists(job[1]):
+                os.remove(job[1])
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_job, jobs))
+    elapsed = time.perf_counter() - start
+
+    for output, skipped, seconds, size in results:
+        state = "skipped" if skipped else "written"
+        print(f"{state:8} {seconds:7.3f}s {size:>12,} bytes  {output}")
+    converted = sum(1 for r in results if not r[1])
+    total_bytes = sum(r[3] for r in results if not r[1])
+    print(f"{converted} converted, {len(results) - converted} up to date, "
+          f"{total_bytes:,} bytes written in {elapsed:.2f}s")
+
+    return results
+
+
+def main():
+    """
+    Main function to convert a JPEG file to a C-style hex array.
+
+    Examples:
+    python jpg_to_rgb888_hex.py usb_camera.jpg output_array.c
+    python jpg_to_rgb888_hex.py usb_camera.jpg out.h --format rgb565be --name usb_camera_rgb565
+    python jpg_to_rgb888_hex.py --batch . --formats rgb888,rgb565le
+    python jpg_to_rgb888_hex.py --batch fixtures.json --workers 8
+    """
+    parser = argparse.ArgumentParser(description="Convert a JPEG file to a C-style hex array")
+    parser.add_argument("input", nargs="?", default="usb_camera.jpg", help="JPEG file to convert")
+    parser.add_argument("output", nargs="?", default="output_array.c", help="Output C file")
+    parser.add_argument("--format", choices=FORMATS, default="rgb888", help="Output pixel format")
+    parser.add_argument("--name", default="image_data", help="Name of the C array")
+    parser.add_argument("--batch", metavar="DIR_OR_MANIFEST",
+                        help="Convert a directory of JPEGs or a JSON manifest in parallel")
+    parser.add_argument("--formats", default="rgb888",
+                        help="Comma-separated formats for --batch with a directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --batch")
+    parser.add_argument("--force", action="store_true", help="Regenerate up-to-date outputs")
+    args = parser.parse_args()
 
-    # Convert JPEG to C-style RGB888 hex array
-    jpg_to_rgb888_hex_c_array(input_filename, output_filename)
+    if args.batch:
+        formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+        unknown = [f for f in formats if f not in FORMATS]
+        if unknown:
+            parser.error(f"unknown format(s): {', '.join(unknown)}")
+        batch_convert(args.batch, formats, args.workers, args.force)
+    else:
+        jpg_to_hex_c_array(args.input, args.output, args.format, args.name)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from jpg_to_rgb888_hex import FORMATS, _convert_rows
+
+# Bytes read from the fixture per tokenizer step
+READ_BLOCK_SIZE = 1 << 16
+
+_DECLARATION = re.compile(rb"unsigned\s+(int|char)\s+(\w+)\s*\[\s*(\d*)\s*\]\s*=\s*\{")
+_HEX_TOKEN = re.compile(rb"0[xX]([0-9A-Fa-f]+)")
+
+
+def parse_c_array(filename: str) -> tuple:
+    """
+    Parse the first C array in a fixture file into a NumPy buffer.
+
+    The file is tokenized in READ_BLOCK_SIZE blocks; a token cut at a block
+    boundary is carried over into the next block.
+
+    Parameters:
+    filename (str): The path to the C header or source file.
+
+    Returns:
+    tuple: (ctype, name, values) where ctype is "int" or "char" and values is a uint32 array.
+    """
+    chunks = []
+    ctype = name = None
+    carry = b""
+    with open(filename, "rb") as file:
+        while True:
+            block = file.read(READ_BLOCK_SIZE)
+            data = carry + block
+            if ctype is None:
+                match = _DECLARATION.search(data)
+                if match is None:
+                    # Keep enough of the tail to match a declaration split across blocks
+                    carry = data[-256:]
+                    if not block:
+                        raise ValueError(f"No C array declaration found in {filename}")
+                    continue
+                ctype, name = match.group(1).decode(), match.group(2).decode()
+                data = data[match.end():]
+
+            end = data.find(b"}")
+            if end >= 0:
+                data, block = data[:end], b""
+            # Hold back a possibly incomplete trailing token
+            cut = len(data) if not block else max(data.rfind(b","), 0)
+            tokens = _HEX_TOKEN.findall(data[:cut])
+            carry = data[cut:]
+            if tokens:
+                chunks.append(np.fromiter((int(t, 16) for t in tokens), dtype=np.uint32, count=len(tokens)))
+            if not block:
+                break
+
+    values = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint32)
+    return ctype, name, values
+
+
+def _to_channels(values: np.ndarray, fmt: str, ctype: str, shape: tuple) -> np.ndarray:
+    """
+    Expand fixture values to an (height, width, channels) array on an 8-bit scale.
+
+    Parameters:
+    values (np.ndarray): Values as parsed from the fixture.
+    fmt (str): Pixel format, one of FORMATS.
+    ctype (str): "int" for one word per pixel, "char" for a byte array.
+    shape (tuple): (height, width) of the reference image.
+
+    Returns:
+    np.ndarray: int16 array of channel values.
+    """
+    height, width = shape
+    if fmt == "rgb888":
+        if ctype == "int":
+            rgb = np.stack(((values >> 16) & 0xFF, (values >> 8) & 0xFF, values & 0xFF), axis=-1)
+        else:
+            rgb = values.reshape(-1, 3)
+        return rgb.astype(np.int16).reshape(height, width, 3)
+
+    pairs = values.reshape(-1, 2)
+    hi, lo = (pairs[:, 0], pairs[:, 1]) if fmt == "rgb565be" else (pairs[:, 1], pairs[:, 0])
+    color = (hi << 8) | lo
+    rgb = np.stack(((color >> 8) & 0xF8, (color >> 3) & 0xFC, (color << 3) & 0xF8), axis=-1)
+    return rgb.astype(np.int16).reshape(height, width, 3)
+
+
+def verify_fixture(fixture_filename: str, jpeg_filename: str, fmt: str = "rgb888") -> dict:
+    """
+    Compare a generated C-array fixture against a reference decode of its JPEG.
+
+    Parameters:
+    fixture_filename (str): The path to the generated C array.
+    jpeg_filename (str): The path to the source JPEG file.
+    fmt (str): Pixel format of the fixture, one of FORMATS.
+
+    Returns:
+    dict: Array name, per-channel max and mean absolute error, and the
+    (height, width) heat map of the largest channel error per pixel.
+    """
+    ctype, name, values = parse_c_array(fixture_filename)
+
+    with Image.open(jpeg_filename) as img:
+        reference = np.asarray(img.convert("RGB"))
+    height, width = reference.shape[:2]
+
+    per_pixel = (1 if ctype == "int" else 3) if fmt == "rgb888" else 2
+    if len(values) != height * width * per_pixel:
+        raise ValueError(f"{fixture_filename}: {len(values)} values, expected "
+                         f"{height * width * per_pixel} for a {width}x{height} {fmt} image")
+
+    # Run the reference through the same packing as the generator so both
+    # sides carry identical quantization
+    expected = _convert_rows(reference, fmt)
+    if fmt == "rgb888" and ctype == "char":
+        expected = reference.ravel().astype(np.uint32)
+
+    actual = _to_channels(values, fmt, ctype, (height, width))
+    wanted = _to_channels(expected, fmt, ctype, (height, width))
+    error = np.abs(actual - wanted)
+
+    return {
+        "name": name,
+        "max_error": error.max(axis=(0, 1)),
+        "mean_error": error.mean(axis=(0, 1)),
+        "heat_map": error.max(axis=2).astype(np.uint8),
+    }
+
+
+def save_heat_map(heat_map: np.ndarray, filename: str, tolerance: int) -> None:
+    """Write the heat map as an image: black matches, red above tolerance, yellow within it."""
+    rgb = np.zeros(heat_map.shape + (3,), dtype=np.uint8)
+    scale = max(int(heat_map.max()), 1)
+    level = (heat_map.astype(np.uint32) * 255 // scale).astype(np.uint8)
+    over = heat_map > tolerance
+    rgb[..., 0] = np.where(heat_map > 0, np.maximum(level, 96), 0)
+    rgb[..., 1] = np.where(over, 0, rgb[..., 0])
+    Image.fromarray(rgb).save(filename)
+
+
+def main():
+    """
+    Verify a generated fixture against its source JPEG.
+
+    Examples:
+    python verify_rgb888_fixture.py test_usb_camera_2_rgb888.h usb_camera_2.jpg
+    python verify_rgb888_fixture.py test_logo_rgb888.h logo.jpg --tolerance 4 --heatmap logo_diff.png
+
+    Exits with status 1 if any channel differs by more than the tolerance.
+    """
+    parser = argparse.ArgumentParser(description="Verify a C-array fixture against its source JPEG")
+    parser.add_argument("fixture", help="Generated C header or source file")
+    parser.add_argument("jpeg", help="Source JPEG file")
+    parser.add_argument("--format", choices=FORMATS, default="rgb888", help="Fixture pixel format")
+    parser.add_argument("--tolerance", type=int, default=0, help="Allowed per-channel difference")
+    parser.add_argument("--heatmap", help="Write a mismatch heat map image to this path")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = verify_fixture(args.fixture, args.jpeg, args.format)
+    elapsed = time.perf_counter() - start
+
+    heat_map = result["heat_map"]
+    mismatched = int(np.count_nonzero(heat_map > args.tolerance))
+    channels = "RGB" if len(result["max_error"]) == 3 else "Y"
+    print(f"{args.fixture} ({result['name']}) vs {args.jpeg}: {heat_map.shape[1]}x{heat_map.shape[0]} "
+          f"{args.format}, verified in {elapsed * 1000:.1f} ms")
+    for i, channel in enumerate(channels):
+        print(f"  {channel}: max error {int(result['max_error'][i])}, mean error {result['mean_error'][i]:.3f}")
+    print(f"  {mismatched} of {heat_map.size} pixels exceed tolerance {args.tolerance}")
+
+    if args.heatmap:
+        save_heat_map(heat_map, args.heatmap, args.tolerance)
+        print(f"  heat map saved to {args.heatmap}")
+
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
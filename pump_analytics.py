@@ -0,0 +1,452 @@
+"""
+Pump Analytics
+How long each pump actually ran, per device per day, from the status history
+recorded by device_history.py. Runtime is the billing and water-use metric.
+- ON intervals are rebuilt from pump_status segments; the last report of a
+  segment vouches for at most one more heartbeat, so a missed-heartbeat gap is
+  never counted as runtime
+- Intervals are split at local midnight and summed per device per day with
+  NumPy (np.repeat + np.bincount), no Python loop over intervals
+- Duty cycle is runtime over the window; coverage is the share of the window
+  with data, so a low runtime can be told apart from a silent device
+- Anomalies: runs longer than LONG_RUN_SECONDS (a pump left on), data gaps of
+  REPORT_GAP_SECONDS or more (flagged if the pump was on when data stopped),
+  days far above the device's own norm, and devices with no data at all
+- Closed days are rolled up into per device-day rows (daily table) by
+  --rollup, run hourly from cron; a report reads the rollup for those days and
+  raw segments only for the last day or two, so a fleet-year takes milliseconds
+
+Served by /api/report in dashboard_lambda.py.
+
+Usage:
+    python pump_analytics.py --db pump_history.db --from 2026-10-01 --to 2026-10-31
+    python pump_analytics.py --db pump_history.db --rollup
+    python pump_analytics.py --bench 1000 --days 365
+
+Requires numpy.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import tempfile
+
+import numpy as np
+
+from device_history import HistoryStore, HISTORY_DB, SCHEMA, DAILY_COLUMNS
+from schedule_forecast import DEFAULT_POWER_KW
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Days run from local midnight; the pumps are in India (IST, UTC+5:30)
+REPORT_TZ_OFFSET = 19800
+
+HEARTBEAT_SECONDS = 30
+
+# A single run longer than this is reported (schedules run at most 24 h; manual ON has no limit)
+LONG_RUN_SECONDS = 6 * 3600
+
+# Data gaps at least this long are listed as anomalies
+REPORT_GAP_SECONDS = 3600
+
+# A day is a spike when its runtime is this many standard deviations above the device's mean
+SPIKE_Z = 3.0
+SPIKE_MIN_DAYS = 7
+
+MAX_ANOMALIES = 500
+
+# Days are rolled up into the daily table this long after they end
+ROLLUP_LAG_SECONDS = 86400
+
+DAY = 86400
+
+
+# =============================================================================
+# INTERVALS
+# =============================================================================
+
+def to_arrays(rows):
+    """(device, start, end, pump_status) rows ordered by device and start -> devices, index and value arrays."""
+    if not rows:
+        empty = np.zeros(0)
+        return [], np.zeros(0, dtype=np.int64), empty, empty, np.zeros(0, dtype=bool)
+    names = [r[0] for r in rows]
+    devices, dev = np.unique(np.array(names, dtype=object).astype(str), return_inverse=True)
+    values = np.array([r[1:] for r in rows], dtype=float)
+    return list(devices), dev.astype(np.int64), values[:, 0], values[:, 1], values[:, 2] > 0
+
+
+def covered_until(dev, start, end, heartbeat=HEARTBEAT_SECONDS):
+    """
+    End of the time each segment speaks for: up to one heartbeat beyond its last
+    report, never into the device's next segment. Segments must be ordered by device and start.
+    """
+    same_next = np.r_[dev[1:] == dev[:-1], False]
+    follows = np.where(same_next, np.r_[start[1:], np.inf] - end, np.inf)
+    return end + np.clip(follows, 0, heartbeat)
+
+
+def data_gaps(dev, start, covered_end, status, until=np.inf):
+    """
+    (dev, start, end, pump_was_on) for the uncovered time between a device's segments,
+    and after its last segment up to `until` (the end of the history known so far).
+    """
+    between = np.r_[dev[1:] == dev[:-1], False]
+    next_start = np.where(between, np.r_[start[1:], np.inf], until)
+    gap = np.isfinite(next_start) & (next_start > covered_end)
+    return dev[gap], covered_end[gap], next_start[gap], status[gap]
+
+
+def daily_seconds(dev, start, end, n_devices, day0, n_days):
+    """Sum [start, end) intervals into an (n_devices, n_days) matrix of seconds per local day."""
+    window_end = day0 + n_days * DAY
+    s = np.clip(start, day0, window_end)
+    e = np.clip(end, day0, window_end)
+    keep = e > s
+    dev, s, e = dev[keep], s[keep], e[keep]
+    first = ((s - day0) // DAY).astype(np.int64)
+    last = np.ceil((e - day0) / DAY).astype(np.int64) - 1
+    spans = last - first + 1
+
+    idx = np.repeat(np.arange(len(s)), spans)
+    day = first[idx] + np.arange(len(idx)) - np.repeat(np.cumsum(spans) - spans, spans)
+    day_start = day0 + day * DAY
+    seconds = np.minimum(e[idx], day_start + DAY) - np.maximum(s[idx], day_start)
+    totals = np.bincount(dev[idx] * n_days + day, weights=seconds, minlength=n_devices * n_days)
+    return totals.reshape(n_devices, n_days)
+
+
+# =============================================================================
+# DAY SUMMARIES
+# =============================================================================
+
+def local_day(t, tz_offset=REPORT_TZ_OFFSET):
+    """Local day number (days since 1970-01-01 local) of a Unix time."""
+    return int((t + tz_offset) // DAY)
+
+
+def day_number(date):
+    """Local day number of a datetime.date or YYYY-MM-DD."""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return (date - datetime.date(1970, 1, 1)).days
+
+
+def _longest_per_cell(cells, lengths, n_cells):
+    """Index of the longest item per cell (-1 where a cell has none)."""
+    best = np.full(n_cells, -1, dtype=np.int64)
+    if len(cells):
+        order = np.lexsort((lengths, cells))
+        last = np.r_[cells[order][1:] != cells[order][:-1], True]
+        best[cells[order][last]] = order[last]
+    return best
+
+
+def summarize(rows, first_day, n_days, tz_offset=REPORT_TZ_OFFSET, until=None):
+    """
+    Per device-day matrices (DAILY_COLUMNS) of history segments for local days
+    first_day .. first_day + n_days - 1. Runs and gaps count on the day they start.
+    A device silent at the end is in a gap up to `until` (default the window end or now).
+    """
+    names, dev, start, end, status = to_arrays(rows)
+    n = len(names)
+    summary = {"devices": names, "first_day": first_day, "n_days": n_days}
+    for field in DAILY_COLUMNS:
+        summary[field] = np.full((n, n_days), np.nan if field.endswith("_start") else 0.0)
+    if not n:
+        return summary
+    day0 = first_day * DAY - tz_offset
+    if until is None:
+        until = min(day0 + n_days * DAY, time.time())
+    covered_end = covered_until(dev, start, end)
+    summary["runtime"] = daily_seconds(dev[status], start[status], covered_end[status], n, day0, n_days)
+    summary["coverage"] = daily_seconds(dev, start, covered_end, n, day0, n_days)
+
+    gap_dev, gap_start, gap_end, gap_on = data_gaps(dev, start, covered_end, status, until)
+    for kind, d, s, e, extra in (("run", dev[status], start[status], covered_end[status], None),
+                                 ("gap", gap_dev, gap_start, gap_end, gap_on)):
+        day = ((s - day0) // DAY).astype(np.int64)
+        inside = (day >= 0) & (day < n_days)
+        cells = d[inside] * n_days + day[inside]
+        lengths = (e - s)[inside]
+        if kind == "run":
+            summary["runs"] = np.bincount(cells, minlength=n * n_days).reshape(n, n_days).astype(float)
+        best = _longest_per_cell(cells, lengths, n * n_days)
+        has = best >= 0
+        picks = [(f"longest_{kind}", lengths), (f"longest_{kind}_start", s[inside])]
+        if extra is not None:
+            picks.append(("gap_pump_on", extra[inside]))
+        for field, values in picks:
+            summary[field].ravel()[has] = values[best[has]]
+    return summary
+
+
+def summary_rows(summary, mask=None):
+    """(device, day, *DAILY_COLUMNS) rows for the device-days of a summary with any data, or those in mask."""
+    if mask is None:
+        mask = (summary["coverage"] > 0) | (summary["runtime"] > 0) | (summary["longest_gap"] > 0)
+    d, k = np.nonzero(mask)
+    # NaN (no run or gap that day) is stored as NULL
+    values = np.column_stack([summary[field][d, k] for field in DAILY_COLUMNS]).tolist()
+    names = np.array(summary["devices"], dtype=object)[d].tolist()
+    return [(name, day, *row) for name, day, row in zip(names, (k + summary["first_day"]).tolist(), values)]
+
+
+def rollup(store, now=None, batch_devices=100):
+    """
+    Fold closed days into the daily table. A day is rolled up once a further day has
+    passed, so runs in progress at midnight are complete (unless they last over a day).
+    Segments are read up to now, so a gap is measured to the device's next report, or
+    to now while it is still silent (the day keeps that length once rolled up).
+    """
+    now = time.time() if now is None else now
+    target = local_day(now - ROLLUP_LAG_SECONDS)
+    first = store.first_segment_start()
+    if first is None:
+        return 0
+    day = int(store.get_meta("rolled_through", local_day(first)))
+    if day >= target:
+        return 0
+    start = day * DAY - REPORT_TZ_OFFSET
+    # Batches of devices, so each query is a seek on (device, end)
+    devices = store.devices()
+    rows = []
+    for i in range(0, len(devices), batch_devices):
+        segments = store.segments(start - HEARTBEAT_SECONDS, now, devices[i:i + batch_devices])
+        rows.extend(summary_rows(summarize(segments, day, target - day, until=now)))
+    store.write_days(rows, target)
+    return len(rows)
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def fleet_report(store, date_from, date_to, devices=None, only=None, power_kw=DEFAULT_POWER_KW, daily=False):
+    """
+    Report for local dates date_from..date_to inclusive. Rolled-up days are aggregated
+    in SQLite, later days are summarized from raw segments. `only` limits the report to
+    some devices; `devices` lists ids expected to appear (missing ones are no_data).
+    daily=True adds each device's runtime per day.
+    """
+    first_day, last_day = day_number(date_from), day_number(date_to)
+    n_days = last_day - first_day + 1
+    if n_days < 1:
+        raise ValueError("'to' must not be before 'from'")
+    split = min(max(int(store.get_meta("rolled_through", first_day)), first_day), last_day + 1)
+    rolled = split > first_day
+
+    # device -> [runtime, coverage, runs, sum of squared daily runtime]
+    totals = {}
+    outliers = []
+    if rolled:
+        for device, *values in store.day_totals(first_day, split - 1, only):
+            totals[device] = np.array(values, dtype=float)
+        outliers += store.day_outliers(first_day, split - 1, LONG_RUN_SECONDS, REPORT_GAP_SECONDS, only)
+    raw = None
+    if split <= last_day:
+        # One heartbeat of slack on the left: a segment ending just before still covers the first moments
+        start = split * DAY - REPORT_TZ_OFFSET
+        rows = store.segments(start - HEARTBEAT_SECONDS, (last_day + 1) * DAY - REPORT_TZ_OFFSET, only)
+        raw = summarize(rows, split, last_day - split + 1)
+        runtime = raw["runtime"]
+        sums = np.column_stack([runtime.sum(axis=1), raw["coverage"].sum(axis=1), raw["runs"].sum(axis=1),
+                                (runtime ** 2).sum(axis=1)])
+        for device, values in zip(raw["devices"], sums):
+            totals[device] = totals.get(device, 0) + values
+        outliers += summary_rows(raw, (raw["longest_run"] > LONG_RUN_SECONDS) |
+                                 (raw["longest_gap"] >= REPORT_GAP_SECONDS))
+
+    names = sorted(totals)
+    sums = np.array([totals[name] for name in names]).reshape(-1, 4)
+    mean = sums[:, 0] / n_days
+    std = np.sqrt(np.maximum(sums[:, 3] / n_days - mean ** 2, 0))
+
+    spikes = []
+    if n_days >= SPIKE_MIN_DAYS:
+        threshold = dict((name, t) for name, t, s in zip(names, mean + SPIKE_Z * std, std) if s > 0)
+        if rolled:
+            spikes += store.days_above(first_day, split - 1, threshold)
+        if raw is not None:
+            limit = np.array([threshold.get(name, np.inf) for name in raw["devices"]])
+            d, k = np.nonzero(raw["runtime"] > limit[:, None])
+            spikes += [(raw["devices"][i], split + j, raw["runtime"][i, j]) for i, j in zip(d, k)]
+
+    daily_runtime = None
+    if daily:
+        daily_runtime = np.zeros((len(names), n_days))
+        index = {name: i for i, name in enumerate(names)}
+        if rolled:
+            for device, day, seconds in store.days(first_day, split - 1, only, ("runtime",)):
+                daily_runtime[index[device], day - first_day] = seconds
+        if raw is not None:
+            rows = [index[name] for name in raw["devices"]]
+            daily_runtime[rows, split - first_day:] = raw["runtime"]
+
+    expected = devices if only is None else only
+    return build_report(names, sums, mean, outliers, spikes, first_day, n_days, expected, power_kw, daily_runtime)
+
+
+def build_report(names, sums, mean, outliers, spikes, first_day, n_days, devices, power_kw, daily_runtime=None):
+    """Assemble the report dict from per-device totals and flagged device-days."""
+    first_date = datetime.date(1970, 1, 1) + datetime.timedelta(days=first_day)
+    runtime = sums[:, 0]
+    power = np.array([power_kw.get(d, DEFAULT_POWER_KW) if isinstance(power_kw, dict) else power_kw
+                      for d in names], dtype=float)
+
+    anomalies = []
+    for device, day, *row in outliers:
+        values = dict(zip(DAILY_COLUMNS, row))
+        if values["longest_run"] > LONG_RUN_SECONDS:
+            anomalies.append({"device": device, "type": "long_run", "start": round(values["longest_run_start"]),
+                              "hours": round(values["longest_run"] / 3600, 2)})
+        if values["longest_gap"] >= REPORT_GAP_SECONDS:
+            anomalies.append({"device": device, "type": "data_gap", "start": round(values["longest_gap_start"]),
+                              "hours": round(values["longest_gap"] / 3600, 2),
+                              "pump_was_on": bool(values["gap_pump_on"])})
+    mean_by_device = dict(zip(names, mean))
+    for device, day, seconds in spikes:
+        day_start = (day * DAY) - REPORT_TZ_OFFSET
+        anomalies.append({"device": device, "type": "runtime_spike", "start": day_start,
+                          "date": str(datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day))),
+                          "hours": round(float(seconds) / 3600, 2),
+                          "mean_hours": round(float(mean_by_device[device]) / 3600, 2)})
+    missing = sorted(set(devices or ()) - set(names))
+    anomalies.extend({"device": device, "type": "no_data"} for device in missing)
+    anomalies.sort(key=lambda a: (a.get("start") or 0, a["device"]))
+
+    window = n_days * DAY
+    report = {"from": str(first_date), "to": str(first_date + datetime.timedelta(days=n_days - 1)),
+              "days": n_days, "devices": {}}
+    for i, device in enumerate(names):
+        entry = {
+            "runtime_h": round(float(runtime[i]) / 3600, 2),
+            "runs": int(sums[i, 2]),
+            "duty_cycle": round(float(runtime[i]) / window, 4),
+            "coverage": round(float(sums[i, 1]) / window, 4),
+            "energy_kwh": round(float(runtime[i] * power[i]) / 3600, 2),
+        }
+        if daily_runtime is not None:
+            entry["daily_h"] = np.round(daily_runtime[i] / 3600, 2).tolist()
+        report["devices"][device] = entry
+    for device in missing:
+        report["devices"][device] = {"runtime_h": 0.0, "runs": 0, "duty_cycle": 0.0, "coverage": 0.0,
+                                     "energy_kwh": 0.0}
+        if daily_runtime is not None:
+            report["devices"][device]["daily_h"] = [0.0] * n_days
+    report["totals"] = {
+        "devices": len(report["devices"]),
+        "runtime_h": round(float(runtime.sum()) / 3600, 2),
+        "energy_kwh": round(float((runtime * power).sum()) / 3600, 2),
+        "duty_cycle": round(float(runtime.sum()) / (window * max(len(report["devices"]), 1)), 4),
+    }
+    report["anomalies"] = anomalies[:MAX_ANOMALIES]
+    report["anomalies_truncated"] = len(anomalies) > MAX_ANOMALIES
+    return report
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def synthetic_history(path, devices, days, seed=1):
+    """Fill a history database with two runs a day per device and the odd data gap."""
+    rng = np.random.default_rng(seed)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    now = time.time()
+    t0 = now - days * DAY
+    rows = []
+    for d in range(devices):
+        t = t0
+        while t < now:
+            off = float(rng.integers(6, 14)) * 3600
+            on = float(rng.integers(10, 120)) * 60
+            rows.append((f"dev{d}", t, t + off, 0))
+            if rng.random() < 0.02:
+                t += off + 2 * 3600  # missed heartbeats
+            else:
+                t += off
+            rows.append((f"dev{d}", t, t + on, 1))
+            t += on
+    db.executemany("INSERT INTO segments (device, start, end, pump_status) VALUES (?, ?, ?, ?)", rows)
+    db.commit()
+    db.close()
+    return len(rows)
+
+
+def benchmark(path, devices, days, power_kw=DEFAULT_POWER_KW):
+    """Report a year (or `days`) of synthetic fleet history before and after the rollup."""
+    today = datetime.datetime.fromtimestamp(time.time() + REPORT_TZ_OFFSET, datetime.timezone.utc).date()
+    date_from, date_to = str(today - datetime.timedelta(days=days - 1)), str(today)
+    count = synthetic_history(path, devices, days)
+    print(f"{count:,} segments for {devices:,} devices over {days} days")
+    store = HistoryStore(path)
+
+    start = time.perf_counter()
+    raw = fleet_report(store, date_from, date_to, power_kw=power_kw)
+    print(f"report from raw segments:  {time.perf_counter() - start:>6.2f} s")
+    start = time.perf_counter()
+    rolled = rollup(store)
+    print(f"rollup of {rolled:,} device-days: {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    report = fleet_report(store, date_from, date_to, power_kw=power_kw)
+    elapsed = time.perf_counter() - start
+    assert report["totals"] == raw["totals"] and report["anomalies"] == raw["anomalies"]
+    print(f"report with rollup:        {elapsed:>6.2f} s ({report['totals']['runtime_h']:,.0f} pump hours, "
+          f"{len(report['anomalies'])} anomalies)")
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pump runtime and energy report from recorded history")
+    parser.add_argument("--db", default=HISTORY_DB, help="History database (device_history.py)")
+    parser.add_argument("--from", dest="date_from", help="First local date (YYYY-MM-DD), default 30 days ago")
+    parser.add_argument("--to", dest="date_to", help="Last local date (YYYY-MM-DD), default today")
+    parser.add_argument("--devices", help="Comma-separated devices (default: all with data)")
+    parser.add_argument("--power-kw", type=float, default=DEFAULT_POWER_KW, help="Motor power in kW")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--rollup", action="store_true", help="Fold closed days into the daily table and exit")
+    parser.add_argument("--bench", type=int, metavar="DEVICES", help="Time reports over synthetic history (temporary file)")
+    parser.add_argument("--days", type=int, default=365, help="Days of synthetic history for --bench")
+    args = parser.parse_args()
+
+    today = datetime.datetime.fromtimestamp(time.time() + REPORT_TZ_OFFSET, datetime.timezone.utc).date()
+    date_to = args.date_to or str(today)
+    date_from = args.date_from or str(today - datetime.timedelta(days=29))
+    only = [d.strip() for d in args.devices.split(",")] if args.devices else None
+
+    if args.rollup:
+        store = HistoryStore(args.db)
+        print(f"{rollup(store):,} device-days rolled up through {store.get_meta('rolled_through')}")
+        return
+
+    if args.bench:
+        with tempfile.TemporaryDirectory() as tmp:
+            benchmark(os.path.join(tmp, "bench.db"), args.bench, args.days, args.power_kw)
+        return
+
+    store = HistoryStore(args.db, readonly=True)
+    report = fleet_report(store, date_from, date_to, only=only, power_kw=args.power_kw)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'device':<20} {'hours':>9} {'runs':>6} {'duty':>7} {'coverage':>9} {'kWh':>10}")
+    print("-" * 66)
+    for device, r in sorted(report["devices"].items()):
+        print(f"{device:<20} {r['runtime_h']:>9,.2f} {r['runs']:>6} {r['duty_cycle']:>7.1%} "
+              f"{r['coverage']:>9.1%} {r['energy_kwh']:>10,.1f}")
+    t = report["totals"]
+    print(f"\n{t['devices']} devices, {date_from}..{date_to}: {t['runtime_h']:,.1f} pump hours, "
+          f"{t['energy_kwh']:,.1f} kWh, duty cycle {t['duty_cycle']:.1%}")
+    for a in report["anomalies"]:
+        print(f"  ! {a['device']}: {a['type']} {json.dumps({k: v for k, v in a.items() if k not in ('device', 'type')})}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import sqlite3
+
+from device_history import HistoryStore, SCHEMA
+from pump_analytics import DAY, HEARTBEAT_SECONDS, REPORT_TZ_OFFSET, fleet_report, rollup, summarize
+
+DAY0 = 20380
+T0 = DAY0 * DAY - REPORT_TZ_OFFSET
+
+
+def test_trailing_gap_is_reported_up_to_window_end():
+    rows = [("pump", T0, T0 + 3600, 1)]
+    summary = summarize(rows, DAY0, 1)
+    assert summary["longest_gap"][0, 0] == DAY - 3600 - HEARTBEAT_SECONDS
+    assert summary["longest_gap_start"][0, 0] == T0 + 3600 + HEARTBEAT_SECONDS
+    assert summary["gap_pump_on"][0, 0] == 1
+
+
+def test_trailing_gap_stops_at_now():
+    rows = [("pump", T0, T0 + 3600, 0)]
+    summary = summarize(rows, DAY0, 1, until=T0 + 3600 + HEARTBEAT_SECONDS)
+    assert summary["longest_gap"][0, 0] == 0
+
+
+def test_rollup_records_a_silence_longer_than_the_lag(tmp_path):
+    path = str(tmp_path / "history.db")
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.executemany("INSERT INTO segments (device, start, end, pump_status) VALUES (?, ?, ?, ?)",
+                   [("pump", T0, T0 + 3600, 1), ("other", T0, T0 + 5 * DAY, 0)])
+    db.commit()
+    db.close()
+
+    store = HistoryStore(path)
+    try:
+        now = T0 + 5 * DAY
+        assert rollup(store, now=now) > 0
+        gaps = [a for a in fleet_report(store, "2025-10-19", "2025-10-19")["anomalies"]
+                if a["type"] == "data_gap"]
+        assert gaps == [{"device": "pump", "type": "data_gap", "start": T0 + 3600 + HEARTBEAT_SECONDS,
+                         "hours": round((now - T0 - 3600 - HEARTBEAT_SECONDS) / 3600, 2), "pump_was_on": True}]
+    finally:
+        store.close()
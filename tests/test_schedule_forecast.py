@@ -0,0 +1,97 @@
+import random
+
+import numpy as np
+import pytest
+
+from schedule_forecast import SCHEDULER_PERIOD_SECONDS as TICK, forecast, run_intervals
+
+T0 = 1_700_000_000
+
+
+def simulate(schedules, window_start, window_end):
+    """
+    Step scheduler_check_callback() in main/main.c every tick of the window and
+    return (runs, [on, off) intervals). Each run arms its own off timer; at equal
+    times the scheduler's ON comes before an earlier run's OFF, as in forecast().
+    """
+    schedules = [dict(s) for s in schedules]
+    events = []
+    runs = 0
+    now = -(-window_start // TICK) * TICK
+    while now < window_end:
+        for s in schedules:
+            if not s.get("enabled", True):
+                continue
+            if s.get("interval", 0) == 0:
+                should_run = now >= s["start"] and s.get("last_run", 0) == 0
+            else:
+                should_run = now >= s["start"] and (s.get("last_run", 0) == 0 or now - s["last_run"] >= s["interval"])
+            if should_run:
+                s["last_run"] = now
+                runs += 1
+                events += [(now, 0), (min(now + s["duration"], window_end), 1)]
+                if s.get("interval", 0) == 0:
+                    s["enabled"] = False
+        now += TICK
+
+    events.sort()
+    intervals = []
+    for (time, kind), (next_time, _) in zip(events, events[1:]):
+        if kind == 0 and next_time > time:
+            if intervals and intervals[-1][1] == time:
+                intervals[-1][1] = next_time
+            else:
+                intervals.append([time, next_time])
+    return runs, intervals
+
+
+def check(schedules, window_start, window_end):
+    runs, intervals = simulate(schedules, window_start, window_end)
+    result = forecast({"pump": schedules}, window_start, window_end)["pump"]
+    assert result["runs"] == runs
+    assert result["runtime_s"] == sum(off - on for on, off in intervals)
+    assert run_intervals("pump", schedules, window_start, window_end).tolist() == intervals
+
+
+@pytest.mark.parametrize("schedules", [
+    # One-shot: in the window, overdue (fires on the first tick), already run, disabled
+    [{"start": T0 + 3605, "duration": 900, "interval": 0}],
+    [{"start": T0 - 500, "duration": 900, "interval": 0}],
+    [{"start": T0 + 100, "duration": 900, "interval": 0, "last_run": T0 - 10}],
+    [{"start": T0 + 100, "duration": 900, "interval": 0, "enabled": False}],
+    # Recurring: on the tick, starting before the window, after a known last run
+    [{"start": T0 + 600, "duration": 1800, "interval": 86400}],
+    [{"start": T0 - 86400 * 3 + 7, "duration": 1800, "interval": 21600}],
+    [{"start": T0 - 86400, "duration": 600, "interval": 3600, "last_run": T0 - 1200}],
+    [{"start": T0 - 86400, "duration": 600, "interval": 3600, "last_run": T0 - 7205}],
+    # Intervals that are not a multiple of the tick drift to the next tick
+    [{"start": T0 + 3, "duration": 40, "interval": 95}],
+    [{"start": T0, "duration": 3000, "interval": 3601}],
+    # Runs of one device that overlap: the earlier off timer still switches the pump off
+    [{"start": T0, "duration": 1200, "interval": 1800},
+     {"start": T0 + 900, "duration": 1200, "interval": 1800}],
+    [{"start": T0, "duration": 7200, "interval": 3600}],
+])
+def test_forecast_matches_tick_simulation(schedules):
+    check(schedules, T0, T0 + 2 * 86400)
+
+
+def test_forecast_matches_tick_simulation_random():
+    rng = random.Random(42)
+    for _ in range(40):
+        schedules = []
+        for _ in range(rng.randint(1, 4)):
+            interval = rng.choice([0, rng.randint(20, 7200), rng.choice([3600, 86400])])
+            schedule = {"start": T0 + rng.randint(-86400, 86400), "duration": rng.randint(10, 5400),
+                        "interval": interval, "enabled": rng.random() < 0.9}
+            if rng.random() < 0.3:
+                schedule["last_run"] = T0 - rng.randint(1, 3 * max(interval, 600))
+            schedules.append(schedule)
+        window_start = T0 + rng.randint(0, 3600)
+        check(schedules, window_start, window_start + rng.randint(3600, 86400))
+
+
+def test_empty_window_has_no_runs():
+    assert run_intervals("pump", [], T0, T0 + 3600).shape == (0, 2)
+    assert np.array_equal(run_intervals("pump", [{"start": T0 + 7200, "duration": 60, "interval": 0}],
+                                        T0, T0 + 3600), np.zeros((0, 2)))
@@ -0,0 +1,39 @@
+from schedule_mirror import ScheduleMirror, expand
+
+DAY = 86400
+DAY0 = 1_700_000_000 // DAY * DAY
+DAILY_6AM = {"id": 1, "start": DAY0 + 6 * 3600, "duration": 1800, "interval": DAY,
+             "enabled": True, "last_run": 0}
+
+
+def one_shot(start, duration=600):
+    return {"id": 2, "start": start, "duration": duration, "interval": 0}
+
+
+def test_recurring_runs_stay_on_their_grid_when_last_run_is_unknown():
+    # Added through the mirror: last_run stays 0 long after start has passed
+    mirror = ScheduleMirror()
+    mirror.load("pump", [DAILY_6AM])
+    noon = DAY0 + 5 * DAY + 12 * 3600
+
+    conflicts = mirror.overlaps("pump", one_shot(DAY0 + 6 * DAY + 6 * 3600), now=noon)
+    assert conflicts == [{"id": 1, "start": DAY0 + 6 * DAY + 6 * 3600, "end": DAY0 + 6 * DAY + 6 * 3600 + 1800}]
+    assert mirror.overlaps("pump", one_shot(DAY0 + 6 * DAY + 12 * 3600), now=noon) == []
+
+
+def test_stale_last_run_is_carried_forward_by_whole_periods():
+    schedule = {**DAILY_6AM, "last_run": DAY0 + DAY + 6 * 3600 + 30}
+    runs = expand(schedule, DAY0 + 5 * DAY + 12 * 3600, horizon=2 * DAY)
+    assert runs[0] == (DAY0 + 6 * DAY + 6 * 3600 + 30, DAY0 + 6 * DAY + 6 * 3600 + 1830)
+
+
+def test_fresh_last_run_and_run_in_progress():
+    last_run = DAY0 + 5 * DAY + 6 * 3600
+    runs = expand({**DAILY_6AM, "last_run": last_run}, last_run + 600, horizon=DAY)
+    assert runs == [(last_run, last_run + 1800), (last_run + DAY, last_run + DAY + 600)]
+
+
+def test_one_shot_runs_once_at_the_next_tick():
+    now = DAY0 + 3
+    assert expand(one_shot(DAY0 - 100), now) == [(DAY0 + 10, DAY0 + 610)]
+    assert expand({**one_shot(DAY0 - 100), "last_run": DAY0 - 90}, now) == []
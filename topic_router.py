@@ -0,0 +1,241 @@
+"""
+Topic Router
+Routes MQTT topics to handlers for backend services that follow many
+subscriptions at once (pump/<id>/status, pump/<id>/tx, simcam/<id>, simcam/<id>/status).
+- Subscriptions live in a trie indexed by topic level, so matching a topic costs
+  one walk per level (plus the + and # branches) however many subscriptions exist
+- Standard MQTT filters: + matches one level, # matches the rest (including the
+  parent level), and wildcards never match topics starting with $
+- Results for hot topics are cached (LRU); subscribe/unsubscribe invalidates the cache
+
+Example:
+    router = TopicRouter()
+    router.subscribe("pump/+/status", on_status)
+    router.subscribe("simcam/#", on_camera)
+    router.dispatch(message.topic.value, message.payload)
+
+Usage (micro-benchmark):
+    python topic_router.py --subscriptions 100000 --lookups 200000
+"""
+
+import time
+import random
+import argparse
+import collections
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Distinct topics whose match results are kept
+MATCH_CACHE_SIZE = 4096
+
+
+# =============================================================================
+# TRIE
+# =============================================================================
+
+class _Node:
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children = {}
+        self.handlers = []
+
+
+def validate_filter(pattern):
+    """Raise ValueError unless pattern is a valid MQTT topic filter."""
+    if not pattern:
+        raise ValueError("Empty topic filter")
+    levels = pattern.split("/")
+    for i, level in enumerate(levels):
+        if level == "#" and i != len(levels) - 1:
+            raise ValueError(f"'#' must be the last level: {pattern}")
+        if level not in ("+", "#") and ("+" in level or "#" in level):
+            raise ValueError(f"Wildcards must occupy a whole level: {pattern}")
+    return levels
+
+
+class TopicRouter:
+    """Level-indexed trie of topic filters with an LRU cache of match results."""
+
+    def __init__(self, cache_size=MATCH_CACHE_SIZE):
+        self._root = _Node()
+        self._count = 0
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self):
+        return self._count
+
+    def subscribe(self, pattern, handler):
+        """Route topics matching pattern to handler."""
+        node = self._root
+        for level in validate_filter(pattern):
+            node = node.children.setdefault(level, _Node())
+        node.handlers.append(handler)
+        self._count += 1
+        self._cache.clear()
+
+    def unsubscribe(self, pattern, handler):
+        """Remove one handler from pattern; return False if it was not subscribed."""
+        levels = validate_filter(pattern)
+        path = [self._root]
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+        try:
+            path[-1].handlers.remove(handler)
+        except ValueError:
+            return False
+        self._count -= 1
+        self._cache.clear()
+        # Prune branches left without handlers or children
+        for depth in range(len(levels), 0, -1):
+            node = path[depth]
+            if node.handlers or node.children:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+        return True
+
+    def match(self, topic):
+        """Return a tuple of handlers whose filters match topic."""
+        cached = self._cache.get(topic)
+        if cached is not None:
+            self._cache.move_to_end(topic)
+            self.stats["hits"] += 1
+            return cached
+        self.stats["misses"] += 1
+        result = tuple(self._walk(topic.split("/"), topic.startswith("$")))
+        if self.cache_size:
+            self._cache[topic] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _walk(self, levels, system):
+        handlers = []
+        nodes = [self._root]
+        last = len(levels) - 1
+        for i, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                # $SYS-style topics are only matched by filters naming the first level
+                if not (system and i == 0):
+                    rest = children.get("#")
+                    if rest is not None:
+                        handlers.extend(rest.handlers)
+                    plus = children.get("+")
+                    if plus is not None:
+                        next_nodes.append(plus)
+                exact = children.get(level)
+                if exact is not None:
+                    next_nodes.append(exact)
+            if not next_nodes:
+                return handlers
+            nodes = next_nodes
+            if i == last:
+                for node in nodes:
+                    handlers.extend(node.handlers)
+                    # "a/#" also matches "a"
+                    rest = node.children.get("#")
+                    if rest is not None:
+                        handlers.extend(rest.handlers)
+        return handlers
+
+    def dispatch(self, topic, *args):
+        """Call every matching handler with (topic, *args); return how many were called."""
+        handlers = self.match(topic)
+        for handler in handlers:
+            handler(topic, *args)
+        return len(handlers)
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def _linear_match(filters, topic):
+    """The split('/') comparison against every filter that the router replaces."""
+    parts = topic.split("/")
+    matched = []
+    for pattern, levels in filters:
+        for i, level in enumerate(levels):
+            if level == "#":
+                matched.append(pattern)
+                break
+            if i >= len(parts) or (level != "+" and level != parts[i]):
+                break
+        else:
+            if len(levels) == len(parts):
+                matched.append(pattern)
+    return matched
+
+
+def benchmark(subscriptions, lookups, hot_topics=1000, seed=1):
+    """Time matching against `subscriptions` per-device filters plus the usual wildcards."""
+    rng = random.Random(seed)
+    devices = max(subscriptions // 4, 1)
+    suffixes = ["pump/{}/status", "pump/{}/tx", "simcam/{}", "simcam/{}/status"]
+    router = TopicRouter()
+    filters = []
+
+    start = time.perf_counter()
+    for i in range(subscriptions):
+        pattern = suffixes[i % 4].format(f"dev{i // 4}")
+        router.subscribe(pattern, pattern)
+        filters.append((pattern, pattern.split("/")))
+    for pattern in ("pump/+/status", "pump/+/liveness", "simcam/#", "$SYS/broker/#"):
+        router.subscribe(pattern, pattern)
+        filters.append((pattern, pattern.split("/")))
+    build = time.perf_counter() - start
+    print(f"{len(router):,} subscriptions built in {build:.2f}s")
+
+    def topic():
+        return rng.choice(suffixes).format(f"dev{rng.randrange(devices)}")
+
+    cold = [topic() for _ in range(lookups)]
+    hot_pool = [topic() for _ in range(hot_topics)]
+    hot = [rng.choice(hot_pool) for _ in range(lookups)]
+
+    # Cold: every lookup walks the trie
+    router.cache_size = 0
+    start = time.perf_counter()
+    matched = sum(len(router.match(t)) for t in cold)
+    elapsed = time.perf_counter() - start
+    print(f"trie, uncached:  {lookups / elapsed:>12,.0f} lookups/s ({matched / lookups:.2f} handlers per topic)")
+
+    router.cache_size = MATCH_CACHE_SIZE
+    router.stats = {"hits": 0, "misses": 0}
+    start = time.perf_counter()
+    for t in hot:
+        router.match(t)
+    elapsed = time.perf_counter() - start
+    print(f"trie, {hot_topics:,} hot topics: {lookups / elapsed:>9,.0f} lookups/s "
+          f"({router.stats['hits'] / max(router.stats['hits'] + router.stats['misses'], 1):.0%} cache hits)")
+
+    sample = cold[:max(lookups // 1000, 20)]
+    start = time.perf_counter()
+    for t in sample:
+        _linear_match(filters, t)
+    elapsed = time.perf_counter() - start
+    print(f"linear scan:     {len(sample) / elapsed:>12,.0f} lookups/s")
+    for t in sample:
+        assert sorted(router.match(t)) == sorted(_linear_match(filters, t)), t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trie topic routing")
+    parser.add_argument("--subscriptions", type=int, default=100000, help="Per-device subscriptions")
+    parser.add_argument("--lookups", type=int, default=200000, help="Topics matched per run")
+    parser.add_argument("--hot-topics", type=int, default=1000, help="Distinct topics in the cached run")
+    args = parser.parse_args()
+    benchmark(args.subscriptions, args.lookups, args.hot_topics)
+
+
+if __name__ == "__main__":
+    main()